@@ -1,8 +1,12 @@
+import asyncio
+import io
 import os
+import platform
 import sys
 import subprocess
 import time
 import json
+import logging
 import shutil
 import tarfile
 import urllib.request
@@ -10,91 +14,383 @@ import zipfile
 import stat
 import tempfile
 import importlib
+import functools
+import importlib.metadata
+import importlib.util
+import re
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def run_command(cmd, retries=1, timeout=300):
-    """Run a command with retries"""
+try:
+    import urllib3
+    from urllib3.util.retry import Retry
+except ImportError:
+    urllib3 = None
+
+try:
+    from packaging.requirements import Requirement
+except ImportError:
+    Requirement = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DOWNLOAD_WORKERS = 8
+COPY_BUFSIZE = 1024 * 1024
+# Seconds to wait for a connection or for the next chunk of a response
+DOWNLOAD_TIMEOUT = 30.0
+LOG_BUFSIZE = 64 * 1024
+PIP_CACHE_DIR = os.path.expanduser("~/.cache/pip-wheels")
+
+log = logging.getLogger(__name__)
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to its buffer, except for warnings and errors"""
+    
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.WARNING:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+class ResponseStream(io.RawIOBase):
+    """Readable file object over a streaming httpx response"""
+    
+    def __init__(self, response):
+        self._response = response
+        self._chunks = response.iter_bytes(COPY_BUFSIZE)
+        self._pending = memoryview(b"")
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        if not self._pending:
+            self._pending = memoryview(next(self._chunks, b""))
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+    
+    def close(self):
+        self._response.close()
+        super().close()
+
+class DownloadCancelled(RuntimeError):
+    """Raised when a racing download stops because another one already won"""
+
+class CancellableStream(io.RawIOBase):
+    """Readable wrapper that raises once cancelled() returns True"""
+    
+    def __init__(self, stream, cancelled):
+        self._stream = stream
+        self._cancelled = cancelled
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        if self._cancelled():
+            raise DownloadCancelled("download cancelled")
+        return self._stream.readinto(buffer)
+
+# Shared connection pool so keep-alive and TLS sessions survive across downloads
+_POOL = urllib3.PoolManager(
+    maxsize=DOWNLOAD_WORKERS,
+    retries=Retry(total=3, backoff_factor=0.5),
+    timeout=urllib3.Timeout(connect=DOWNLOAD_TIMEOUT, read=DOWNLOAD_TIMEOUT)
+) if urllib3 else None
+
+# HTTP/2 client, preferred when available so concurrent downloads from the
+# same host share one connection instead of opening one each; httpx only
+# speaks HTTP/2 when h2 is installed. The transport retries failed connects;
+# other transport errors fall back to the urllib3 pool in open_url
+_HTTP2_CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(http2=True, retries=3),
+    follow_redirects=True,
+    timeout=httpx.Timeout(DOWNLOAD_TIMEOUT)
+) if httpx and importlib.util.find_spec("h2") is not None else None
+
+# PATH entries, split and de-duplicated once; add_to_path is the only writer
+_PATH_PARTS = list(dict.fromkeys(os.environ.get("PATH", os.defpath).split(os.pathsep)))
+_PATH_SET = set(_PATH_PARTS)
+_PATH_LOCK = threading.Lock()
+
+# Held by racing Node.js installers while they publish symlinks and PATH entries
+_PUBLISH_LOCK = threading.Lock()
+
+def setup_logging():
+    """Send installer output to stdout through a 64 KiB buffer"""
+    stream = io.TextIOWrapper(
+        open(sys.stdout.fileno(), "wb", buffering=LOG_BUFSIZE, closefd=False),
+        encoding="utf-8"
+    )
+    logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[BufferedStreamHandler(stream)])
+
+def flush_log():
+    """Write out buffered log records, e.g. before another process shares stdout"""
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+def run_command(cmd, retries=1, timeout=300, env=None, cwd=None):
+    """Run a command (argv list or string) with retries, without a shell"""
+    if isinstance(cmd, str):
+        cmd = shlex.split(cmd)
+    argv, cmd = cmd, shlex.join(cmd)
+    
     for attempt in range(retries):
         try:
-            print(f"Attempt {attempt+1}/{retries}: {cmd}")
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=timeout)
+            log.info(f"Attempt {attempt+1}/{retries}: {cmd}")
+            # Commands like the pip batch or make can block for a long time,
+            # so show the progress lines logged so far before starting
+            flush_log()
+            result = subprocess.run(
+                argv,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                env={**os.environ, **env} if env else None,
+                cwd=cwd
+            )
             
             if result.returncode == 0:
-                print(f"✓ Success: {cmd}")
+                log.info(f"✓ Success: {cmd}")
                 if result.stdout.strip():
-                    print(f"Output: {result.stdout[:500]}...")
+                    log.info(f"Output: {result.stdout[:500]}...")
                 return True, result.stdout
             else:
-                print(f"✗ Failed: {cmd}")
+                log.warning(f"✗ Failed: {cmd}")
                 if result.stderr:
-                    print(f"Error: {result.stderr[:500]}...")
+                    log.warning(f"Error: {result.stderr[:500]}...")
                 if attempt < retries - 1:
-                    print("Retrying after 2 seconds...")
+                    log.info("Retrying after 2 seconds...")
                     time.sleep(2)
                     
         except subprocess.TimeoutExpired:
-            print(f"Timeout: {cmd}")
+            log.warning(f"Timeout: {cmd}")
         except Exception as e:
-            print(f"Exception: {e}")
+            log.warning(f"Exception: {e}")
     
     return False, ""
 
+def open_url(url):
+    """Open a streaming HTTP response, reusing pooled connections when available"""
+    if _HTTP2_CLIENT is not None:
+        try:
+            response = _HTTP2_CLIENT.send(_HTTP2_CLIENT.build_request("GET", url), stream=True)
+        except httpx.TransportError as e:
+            log.info(f"HTTP/2 request for {url} failed ({e}), retrying without it")
+        else:
+            if response.status_code >= 400:
+                response.close()
+                raise OSError(f"HTTP {response.status_code} for {url}")
+            return ResponseStream(response)
+    if _POOL is None:
+        return urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT)
+    response = _POOL.request("GET", url, preload_content=False)
+    if response.status >= 400:
+        response.close()
+        raise OSError(f"HTTP {response.status} for {url}")
+    return response
+
+def copy_stream(src, dst, cancelled=None):
+    """Copy src to dst in large chunks, giving up once cancelled() returns True"""
+    while chunk := src.read(COPY_BUFSIZE):
+        if cancelled is not None and cancelled():
+            raise DownloadCancelled("download cancelled")
+        dst.write(chunk)
+
+def download_file(url, path, cancelled=None):
+    """Download a URL to a local file"""
+    with open_url(url) as response, open(path, "wb") as f:
+        copy_stream(response, f, cancelled)
+
+@functools.lru_cache(maxsize=1)
+def native_tar_available():
+    """Check for a tar that understands the GNU-style options fast_extract uses"""
+    if not check_command_exists("tar"):
+        return False
+    try:
+        result = subprocess.run(["tar", "--version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    # BusyBox tar lacks --use-compress-program and may lack -J
+    return result.returncode == 0 and ("GNU tar" in result.stdout or "bsdtar" in result.stdout)
+
+def fast_extract(stream, dest, compression, cancelled=None):
+    """Extract a tar stream into dest, preferring the native tar binary"""
+    if native_tar_available():
+        if compression == "xz" and check_command_exists("xz"):
+            decompress = "--use-compress-program=xz -T0"
+        else:
+            decompress = "-J" if compression == "xz" else "-z"
+        
+        # tar shares our stderr, so keep its messages after our own
+        flush_log()
+        process = subprocess.Popen(["tar", "-x", decompress, "-f", "-", "-C", dest], stdin=subprocess.PIPE)
+        try:
+            copy_stream(stream, process.stdin, cancelled)
+        except BrokenPipeError:
+            pass
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            process.stdin.close()
+        
+        # The stream is consumed by now, so tarfile cannot take over here
+        if process.wait() != 0:
+            raise tarfile.ReadError(f"tar exited with status {process.returncode}")
+        return
+    
+    if cancelled is not None:
+        stream = CancellableStream(stream, cancelled)
+    
+    # tarfile reads in small blocks, so batch the underlying reads
+    buffered = io.BufferedReader(stream, buffer_size=COPY_BUFSIZE)
+    # Single-pass stream mode; the compression is sniffed from the header
+    with tarfile.open(fileobj=buffered, mode="r|*") as tar:
+        # Members are written with copyfileobj, which defaults to 16 KiB chunks
+        tar.copybufsize = COPY_BUFSIZE
+        tar.extractall(dest)
+
+def extract_tar_from_url(url, dest, compression, cancelled=None):
+    """Extract a tar archive while it downloads, without an intermediate file"""
+    with open_url(url) as response:
+        fast_extract(response, dest, compression, cancelled)
+
+@functools.lru_cache(maxsize=None)
 def check_command_exists(cmd):
     """Check if a command exists in the system"""
     return shutil.which(cmd) is not None
 
 def add_to_path(path):
     """Add a directory to PATH environment variable"""
-    if path and os.path.exists(path) and path not in os.environ["PATH"].split(":"):
-        os.environ["PATH"] = f"{path}:{os.environ['PATH']}"
-        os.putenv("PATH", os.environ["PATH"])
-        print(f"Added {path} to PATH")
-        return True
-    return False
+    # Called after every install step, so drop lookups that may now be stale
+    check_command_exists.cache_clear()
+    if not path or not os.path.exists(path):
+        return False
+    
+    with _PATH_LOCK:
+        if path in _PATH_SET:
+            return False
+        _PATH_PARTS.insert(0, path)
+        _PATH_SET.add(path)
+        # Assigning to os.environ already calls putenv
+        os.environ["PATH"] = os.pathsep.join(_PATH_PARTS)
+    
+    log.info(f"Added {path} to PATH")
+    return True
+
+@functools.lru_cache(maxsize=1)
+def node_arch():
+    """Return the Node.js release architecture for this machine"""
+    return "arm64" if platform.machine() in ["aarch64", "arm64"] else "x64"
+
+def replace_symlink(target, link_path):
+    """Point link_path at target, atomically replacing whatever is there"""
+    tmp_path = f"{link_path}.tmp"
+    try:
+        os.symlink(target, tmp_path)
+    except FileExistsError:
+        os.remove(tmp_path)
+        os.symlink(target, tmp_path)
+    os.replace(tmp_path, link_path)
+
+def race_decided(won):
+    """Check whether another racing installer has already succeeded"""
+    return won is not None and won.is_set()
+
+def claim_race(won):
+    """Mark the race as won; call with _PUBLISH_LOCK held"""
+    if won is not None:
+        won.set()
 
 def install_nodejs_restricted():
     """Specialized Node.js installation for highly restricted environments"""
-    print("\n" + "="*60)
-    print("INSTALLING NODE.JS IN RESTRICTED ENVIRONMENT")
-    print("="*60)
+    log.info("\n" + "="*60)
+    log.info("INSTALLING NODE.JS IN RESTRICTED ENVIRONMENT")
+    log.info("="*60)
     
     # First check if Node.js is already installed
     node_exists = check_command_exists("node")
     npm_exists = check_command_exists("npm")
     
     if node_exists and npm_exists:
-        print("Node.js and npm are already installed")
+        log.info("Node.js and npm are already installed")
         run_command("node --version")
         run_command("npm --version")
         return True
     
-    # Try all methods in sequence
+    # The download methods are independent, so race them and keep the first
+    # that works; the source build is slow and CPU-bound, so it stays last
     methods = [
         install_nodejs_portable_binary,
         install_nodejs_precompiled_binary,
-        install_nodejs_static_binary,
-        install_nodejs_from_source_simple
+        install_nodejs_static_binary
     ]
     
-    for i, method in enumerate(methods, 1):
-        print(f"\nTrying method {i}/{len(methods)}")
-        success = method()
-        if success:
-            print(f"✓ Node.js installed successfully using method {i}")
-            return True
-        else:
-            print(f"✗ Method {i} failed")
+    log.info(f"\nTrying {len(methods)} download methods in parallel")
+    if asyncio.run(race_install_methods(methods)):
+        return True
+    
+    log.info("\nTrying source build")
+    if install_nodejs_from_source_simple():
+        log.info("✓ Node.js installed successfully using install_nodejs_from_source_simple")
+        return True
+    log.warning("✗ install_nodejs_from_source_simple failed")
     
-    print("All Node.js installation methods failed!")
+    log.warning("All Node.js installation methods failed!")
     return False
 
-def install_nodejs_portable_binary():
+async def race_install_methods(methods):
+    """Run install methods concurrently and return True as soon as one succeeds"""
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=len(methods))
+    # Set by the winner; the others check it and back off before publishing
+    won = threading.Event()
+    pending = {loop.run_in_executor(executor, method, won): method for method in methods}
+    
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                method = pending.pop(future)
+                try:
+                    success = future.result()
+                except Exception as e:
+                    if not won.is_set():
+                        log.warning(f"{method.__name__} raised: {e}")
+                    success = False
+                
+                if success:
+                    log.info(f"✓ Node.js installed successfully using {method.__name__}")
+                    return True
+                if won.is_set():
+                    # Backed off because another method got there first
+                    log.info(f"{method.__name__} cancelled")
+                else:
+                    log.warning(f"✗ {method.__name__} failed")
+        return False
+    finally:
+        # Threads cannot be interrupted, so let the losers notice and wait for
+        # them; nothing may touch PATH or the symlinks once the race returns
+        won.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def install_nodejs_portable_binary(won=None):
     """Install portable Node.js binary"""
-    print("Downloading portable Node.js binary...")
+    log.info("Downloading portable Node.js binary...")
     
     try:
         # Determine system architecture
-        machine = os.uname().machine
-        arch = "x64" if machine in ["x86_64", "amd64"] else "arm64" if machine in ["aarch64", "arm64"] else "x64"
+        arch = node_arch()
         
         # Create directories for installation
         home_dir = os.path.expanduser("~")
@@ -107,18 +403,10 @@ def install_nodejs_portable_binary():
         # Download Node.js binary (version 20.x)
         version = "20.17.0"
         node_url = f"https://nodejs.org/dist/v{version}/node-v{version}-linux-{arch}.tar.xz"
-        print(f"Downloading Node.js {version} for {arch}...")
+        log.info(f"Downloading Node.js {version} for {arch}...")
         
         # Download and extract
-        node_tar_path = os.path.join(node_dir, "node.tar.xz")
-        urllib.request.urlretrieve(node_url, node_tar_path)
-        
-        # Extract Node.js
-        with tarfile.open(node_tar_path, 'r:xz') as tar:
-            tar.extractall(node_dir)
-        
-        # Remove downloaded archive
-        os.remove(node_tar_path)
+        extract_tar_from_url(node_url, node_dir, "xz", lambda: race_decided(won))
         
         # Get the extracted directory
         extracted_dir = f"node-v{version}-linux-{arch}"
@@ -131,36 +419,36 @@ def install_nodejs_portable_binary():
         node_link_path = os.path.join(bin_dir, "node")
         npm_link_path = os.path.join(bin_dir, "npm")
         
-        # Remove existing symlinks if they exist
-        for link_path in [node_link_path, npm_link_path]:
-            if os.path.exists(link_path) or os.path.islink(link_path):
-                try:
-                    os.remove(link_path)
-                except:
-                    pass
-        
-        # Create new symlinks
-        os.symlink(node_bin_path, node_link_path)
-        os.symlink(npm_bin_path, npm_link_path)
-        
-        # Add to PATH
-        add_to_path(bin_dir)
-        
-        # Verify installation
-        if check_command_exists("node") and check_command_exists("npm"):
-            print("Portable Node.js installed successfully!")
-            run_command("node --version")
-            run_command("npm --version")
-            return True
+        with _PUBLISH_LOCK:
+            if race_decided(won):
+                log.info("Portable binary method stopped: Node.js already installed")
+                return False
+            
+            # Create new symlinks, replacing any existing ones
+            replace_symlink(node_bin_path, node_link_path)
+            replace_symlink(npm_bin_path, npm_link_path)
+            
+            # Add to PATH
+            add_to_path(bin_dir)
+            
+            # Verify installation
+            if check_command_exists("node") and check_command_exists("npm"):
+                claim_race(won)
+                log.info("Portable Node.js installed successfully!")
+                run_command("node --version")
+                run_command("npm --version")
+                return True
             
+    except DownloadCancelled:
+        log.info("Portable binary method cancelled: Node.js already installed")
     except Exception as e:
-        print(f"Portable binary method failed: {e}")
+        log.warning(f"Portable binary method failed: {e}")
     
     return False
 
-def install_nodejs_precompiled_binary():
+def install_nodejs_precompiled_binary(won=None):
     """Install precompiled Node.js binary"""
-    print("Trying precompiled Node.js binary...")
+    log.info("Trying precompiled Node.js binary...")
     
     try:
         # Create installation directory
@@ -171,8 +459,7 @@ def install_nodejs_precompiled_binary():
         os.makedirs(bin_dir, exist_ok=True)
         
         # Download precompiled binary (different source)
-        machine = os.uname().machine
-        arch = "x64" if machine in ["x86_64", "amd64"] else "arm64"
+        arch = node_arch()
         
         # Try different download sources
         download_urls = [
@@ -183,75 +470,106 @@ def install_nodejs_precompiled_binary():
         
         node_bin_path = os.path.join(bin_dir, "node")
         
-        for url in download_urls:
-            try:
-                print(f"Downloading from: {url}")
-                urllib.request.urlretrieve(url, node_bin_path)
-                
-                # Make executable
-                os.chmod(node_bin_path, 0o755)
-                
-                # Add to PATH
-                add_to_path(bin_dir)
-                
-                # Test node
-                if check_command_exists("node"):
-                    print("Precompiled Node.js installed!")
-                    run_command("node --version")
-                    
-                    # Try to get npm separately
-                    install_npm_separately(bin_dir)
-                    return True
+        # Race all sources, first successful download wins
+        candidate_won = threading.Event()
+        cancelled = lambda: candidate_won.is_set() or race_decided(won)
+        executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS)
+        try:
+            futures = {
+                executor.submit(download_candidate, url, f"{node_bin_path}.part{i}", cancelled): url
+                for i, url in enumerate(download_urls)
+            }
+            
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    candidate_path = future.result()
+                    log.info(f"Downloaded from: {url}")
                     
-            except Exception as e:
-                print(f"Download from {url} failed: {e}")
-                continue
+                    with _PUBLISH_LOCK:
+                        if race_decided(won):
+                            os.remove(candidate_path)
+                            log.info("Precompiled binary method stopped: Node.js already installed")
+                            return False
+                        
+                        os.replace(candidate_path, node_bin_path)
+                        
+                        # Make executable
+                        os.chmod(node_bin_path, 0o755)
+                        
+                        # Add to PATH
+                        add_to_path(bin_dir)
+                        
+                        # Test node
+                        if check_command_exists("node"):
+                            candidate_won.set()
+                            claim_race(won)
+                            log.info("Precompiled Node.js installed!")
+                            run_command("node --version")
+                            
+                            # Try to get npm separately
+                            install_npm_separately(bin_dir)
+                            return True
+                        
+                except DownloadCancelled:
+                    log.info(f"Download from {url} cancelled")
+                except Exception as e:
+                    log.warning(f"Download from {url} failed: {e}")
+                    continue
+        finally:
+            # Candidates check the event between chunks, so this wait is short
+            candidate_won.set()
+            executor.shutdown(wait=True, cancel_futures=True)
                 
     except Exception as e:
-        print(f"Precompiled binary method failed: {e}")
+        log.warning(f"Precompiled binary method failed: {e}")
     
     return False
 
+def download_candidate(url, path, cancelled):
+    """Download one racing candidate, discarding it if another already won"""
+    log.info(f"Downloading from: {url}")
+    try:
+        download_file(url, path, cancelled)
+        if cancelled():
+            raise DownloadCancelled("another source finished first")
+    except BaseException:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        raise
+    return path
+
 def install_npm_separately(bin_dir):
     """Install npm separately"""
     try:
         # Download npm separately
         npm_url = "https://registry.npmjs.org/npm/-/npm-10.8.1.tgz"
-        npm_tar_path = os.path.join(bin_dir, "npm.tgz")
-        
-        print("Downloading npm separately...")
-        urllib.request.urlretrieve(npm_url, npm_tar_path)
         
-        # Extract npm
-        with tarfile.open(npm_tar_path, 'r:gz') as tar:
-            tar.extractall(bin_dir)
+        log.info("Downloading npm separately...")
+        extract_tar_from_url(npm_url, bin_dir, "gz")
         
         # Create npm symlink
         npm_bin_path = os.path.join(bin_dir, "package", "bin", "npm-cli.js")
         npm_link_path = os.path.join(bin_dir, "npm")
         
         if os.path.exists(npm_bin_path):
-            if os.path.exists(npm_link_path) or os.path.islink(npm_link_path):
-                try:
-                    os.remove(npm_link_path)
-                except:
-                    pass
-            
-            os.symlink(npm_bin_path, npm_link_path)
+            replace_symlink(npm_bin_path, npm_link_path)
             os.chmod(npm_link_path, 0o755)
             
-            print("npm installed separately!")
+            log.info("npm installed separately!")
             run_command("npm --version")
             return True
             
     except Exception as e:
-        print(f"Separate npm installation failed: {e}")
+        log.warning(f"Separate npm installation failed: {e}")
     
     return False
 
-def install_nodejs_static_binary():
+def install_nodejs_static_binary(won=None):
     """Install static Node.js binary"""
-    print("Trying static Node.js binary...")
+    log.info("Trying static Node.js binary...")
     
     try:
         # Create installation directory
@@ -259,39 +577,41 @@ def install_nodejs_static_binary():
         os.makedirs(install_dir, exist_ok=True)
         
         # Determine architecture
-        machine = os.uname().machine
-        arch = "x64" if machine in ["x86_64", "amd64"] else "arm64"
+        arch = node_arch()
         
         # Download static binary
         static_url = f"https://github.com/mhart/alpine-node/releases/download/v20.17.0/node-v20.17.0-linux-{arch}.tar.gz"
-        static_tar_path = os.path.join(install_dir, "node-static.tar.gz")
-        
-        print("Downloading static Node.js binary...")
-        urllib.request.urlretrieve(static_url, static_tar_path)
-        
-        # Extract
-        with tarfile.open(static_tar_path, 'r:gz') as tar:
-            tar.extractall(install_dir)
         
-        # Add bin directory to PATH
+        log.info("Downloading static Node.js binary...")
+        extract_tar_from_url(static_url, install_dir, "gz", lambda: race_decided(won))
         bin_dir = os.path.join(install_dir, "bin")
-        add_to_path(bin_dir)
         
-        # Verify
-        if check_command_exists("node"):
-            print("Static Node.js installed!")
-            run_command("node --version")
-            run_command("npm --version")
-            return True
+        with _PUBLISH_LOCK:
+            if race_decided(won):
+                log.info("Static binary method stopped: Node.js already installed")
+                return False
+            
+            # Add bin directory to PATH
+            add_to_path(bin_dir)
+            
+            # Verify
+            if check_command_exists("node"):
+                claim_race(won)
+                log.info("Static Node.js installed!")
+                run_command("node --version")
+                run_command("npm --version")
+                return True
             
+    except DownloadCancelled:
+        log.info("Static binary method cancelled: Node.js already installed")
     except Exception as e:
-        print(f"Static binary method failed: {e}")
+        log.warning(f"Static binary method failed: {e}")
     
     return False
 
 def install_nodejs_from_source_simple():
     """Simplified Node.js source compilation"""
-    print("Trying simplified Node.js source build...")
+    log.info("Trying simplified Node.js source build...")
     
     try:
         # Create build directory
@@ -300,60 +620,109 @@ def install_nodejs_from_source_simple():
         
         # Download Node.js source
         source_url = "https://nodejs.org/dist/v20.17.0/node-v20.17.0.tar.gz"
-        source_tar_path = os.path.join(build_dir, "node-src.tar.gz")
         
-        print("Downloading Node.js source...")
-        urllib.request.urlretrieve(source_url, source_tar_path)
-        
-        # Extract source
-        with tarfile.open(source_tar_path, 'r:gz') as tar:
-            tar.extractall(build_dir)
+        log.info("Downloading Node.js source...")
+        extract_tar_from_url(source_url, build_dir, "gz")
         
         # Configure with minimal options
         source_dir = os.path.join(build_dir, "node-v20.17.0")
-        os.chdir(source_dir)
+        
+        configure = ["./configure", f"--prefix={os.path.expanduser('~/.local/node-built')}"]
+        if check_command_exists("ninja"):
+            # make delegates to ninja once configured with --ninja
+            configure.append("--ninja")
+        
+        build_env = None
+        if check_command_exists("ccache"):
+            build_env = {
+                "CC": f"ccache {os.environ.get('CC', 'cc')}",
+                "CXX": f"ccache {os.environ.get('CXX', 'c++')}"
+            }
         
         # Try to configure
-        print("Configuring Node.js build...")
-        success, _ = run_command("./configure --prefix=$HOME/.local/node-built")
+        log.info("Configuring Node.js build...")
+        success, _ = run_command(configure, env=build_env, cwd=source_dir)
         
         if success:
-            # Try to build with minimal resources
-            print("Building Node.js (this may take a while)...")
-            success, _ = run_command("make -j2")  # Use only 2 cores
+            # Build on every available core
+            jobs = os.cpu_count() or 2
+            log.info(f"Building Node.js with {jobs} jobs (this may take a while)...")
+            success, _ = run_command(["make", f"-j{jobs}"], env=build_env, cwd=source_dir)
             
             if success:
                 # Install
-                success, _ = run_command("make install")
+                success, _ = run_command(["make", "install"], env=build_env, cwd=source_dir)
                 
                 if success:
                     # Add to PATH
                     add_to_path(os.path.expanduser("~/.local/node-built/bin"))
                     
                     if check_command_exists("node"):
-                        print("Node.js built from source!")
+                        log.info("Node.js built from source!")
                         run_command("node --version")
                         run_command("npm --version")
                         return True
         
-        # Clean up
-        os.chdir("/")
-        
     except Exception as e:
-        print(f"Source build method failed: {e}")
+        log.warning(f"Source build method failed: {e}")
     
     return False
 
+def requirement_name(requirement):
+    """Return the distribution name of a requirement, or None for VCS/URL requirements"""
+    if "://" in requirement:
+        return None
+    return re.split(r"[\[<>=!~;\s]", requirement, maxsplit=1)[0]
+
+def normalize_name(name):
+    """Normalize a distribution name for comparison"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def installed_distributions():
+    """Map installed distribution names, and the VCS URLs they came from, to versions"""
+    installed = {}
+    for dist in importlib.metadata.distributions():
+        name = dist.metadata["Name"]
+        if name:
+            installed[normalize_name(name)] = dist.version
+        
+        # pip records VCS installs in direct_url.json (PEP 610); a malformed
+        # record only costs this distribution its VCS key
+        try:
+            direct_url = json.loads(dist.read_text("direct_url.json") or "{}")
+            vcs_info = direct_url.get("vcs_info")
+            if vcs_info:
+                url = f"{vcs_info['vcs']}+{direct_url['url']}"
+                revision = vcs_info.get("requested_revision")
+                installed[f"{url}@{revision}" if revision else url] = dist.version
+        except (ValueError, AttributeError, KeyError, TypeError):
+            continue
+    return installed
+
+def missing_requirements(requirements):
+    """Return the requirements that are not installed at a satisfying version"""
+    installed = installed_distributions()
+    missing = []
+    for requirement in requirements:
+        name = requirement_name(requirement)
+        version = installed.get(requirement if name is None else normalize_name(name))
+        if version is None:
+            missing.append(requirement)
+            continue
+        
+        # Without packaging only presence can be checked, not the version
+        if name is not None and Requirement is not None:
+            if not Requirement(requirement).specifier.contains(version, prereleases=True):
+                missing.append(requirement)
+    return missing
+
 def install_python_dependencies_safe():
     """Install Python dependencies with safe fallbacks"""
-    print("\n" + "="*60)
-    print("INSTALLING PYTHON DEPENDENCIES")
-    print("="*60)
+    log.info("\n" + "="*60)
+    log.info("INSTALLING PYTHON DEPENDENCIES")
+    log.info("="*60)
     
-    # First upgrade pip and setuptools
-    run_command(f"{sys.executable} -m pip install --upgrade pip setuptools wheel")
-    
-    # Install packages one by one with individual error handling
+    # Regular packages
     packages = [
         "flask", "aiofiles", "aiohttp", "asyncio", "beautifulsoup4",
         "dnspython", "future==0.18.3", "gitpython", "httpx[http2]",
@@ -373,54 +742,78 @@ def install_python_dependencies_safe():
         "git+https://github.com/joetats/youtube_search@master"
     ]
     
+    # Special handling for problematic packages
+    problem_packages = [
+        ("lxml", "lxml"),
+        ("search_engine_parser", "search_engine_parser"),
+        ("bing_image_downloader", "bing_image_downloader"),
+        ("MukeshAPI", "MukeshAPI"),
+        ("telethon==1.33.1", "telethon"),
+        ("ffmpeg-python", "ffmpeg-python")
+    ]
+    
     all_success = True
+    pip_install = [sys.executable, "-m", "pip", "install", "--cache-dir", PIP_CACHE_DIR]
+    requirements = packages + git_repos + [package_cmd for package_cmd, _ in problem_packages]
+    
+    # Skip pip entirely when a previous boot already satisfied everything
+    to_install = missing_requirements(requirements)
+    if not to_install:
+        log.info("All requirements already installed")
+        return True
+    
+    # First upgrade pip and setuptools
+    run_command([sys.executable, "-m", "pip", "install", "--upgrade", "pip", "setuptools", "wheel"])
+    
+    # Install everything in a single pip run so the resolver sees the whole set
+    log.info(f"Installing {len(to_install)} of {len(requirements)} requirements...")
+    success, _ = run_command(pip_install + ["--prefer-binary"] + to_install, timeout=1800)
+    if success:
+        return True
+    
+    # Retry only the requirements the batch left uninstalled
+    missing = set(missing_requirements(requirements))
     
-    # Install regular packages
     for package in packages:
-        print(f"Installing {package}...")
-        success, _ = run_command(f"{sys.executable} -m pip install --no-cache-dir --prefer-binary {package}")
+        if package not in missing:
+            continue
+        log.info(f"Installing {package}...")
+        success, _ = run_command(pip_install + ["--prefer-binary", package])
         if not success:
-            success, _ = run_command(f"{sys.executable} -m pip install --no-cache-dir {package}")
+            success, _ = run_command(pip_install + [package])
             if not success:
-                print(f"Warning: Failed to install {package}")
+                log.warning(f"Warning: Failed to install {package}")
                 all_success = False
     
-    # Install git repositories
     for repo in git_repos:
-        print(f"Installing from {repo}...")
-        success, _ = run_command(f"{sys.executable} -m pip install --no-cache-dir {repo}")
+        if repo not in missing:
+            continue
+        log.info(f"Installing from {repo}...")
+        success, _ = run_command(pip_install + [repo])
         if not success:
-            print(f"Warning: Failed to install from {repo}")
+            log.warning(f"Warning: Failed to install from {repo}")
             all_success = False
     
-    # Special handling for problematic packages
-    problem_packages = [
-        ("lxml", "lxml"),
-        ("search_engine_parser", "search_engine_parser"),
-        ("bing_image_downloader", "bing_image_downloader"),
-        ("MukeshAPI", "MukeshAPI"),
-        ("telethon==1.33.1", "telethon"),
-        ("ffmpeg-python", "ffmpeg-python")
-    ]
-    
     for package_cmd, package_name in problem_packages:
-        success, _ = run_command(f"{sys.executable} -m pip install --no-cache-dir --prefer-binary {package_cmd}")
+        if package_cmd not in missing:
+            continue
+        success, _ = run_command(pip_install + ["--prefer-binary", package_cmd])
         if not success:
-            success, _ = run_command(f"{sys.executable} -m pip install --no-cache-dir {package_cmd}")
+            success, _ = run_command(pip_install + [package_cmd])
             if not success and package_cmd == "lxml":
-                success, _ = run_command(f"{sys.executable} -m pip install --no-cache-dir lxml --install-option=\"--without-cython\"")
+                success, _ = run_command(pip_install + ["lxml", "--install-option=--without-cython"])
         
         if not success:
-            print(f"Warning: Failed to install {package_name}")
+            log.warning(f"Warning: Failed to install {package_name}")
             all_success = False
     
     return all_success
 
 def start_application():
-    """Start the main application with live logging"""
-    print("\n" + "="*80)
-    print("STARTING MAIN APPLICATION")
-    print("="*80)
+    """Replace this process with the main application; only returns if none could start"""
+    log.info("\n" + "="*80)
+    log.info("STARTING MAIN APPLICATION")
+    log.info("="*80)
     
     # Try different entry points
     entry_points = [
@@ -433,42 +826,45 @@ def start_application():
         [sys.executable, "start.py"]
     ]
     
+    # One directory listing answers every file check below
+    cwd_files = set(os.listdir("."))
+    
     for entry_point in entry_points:
-        # Check if the entry point exists (for files)
-        if len(entry_point) > 1 and not entry_point[1].startswith("-"):
-            if not os.path.exists(entry_point[1]):
-                print(f"Skipping {entry_point[1]} - file not found")
+        # exec has no second chance, so check modules as well as files
+        if entry_point[1] == "-m":
+            if importlib.util.find_spec(entry_point[2]) is None:
+                log.info(f"Skipping {entry_point[2]} - module not found")
                 continue
+        elif entry_point[1] not in cwd_files:
+            log.info(f"Skipping {entry_point[1]} - file not found")
+            continue
+        elif entry_point[1] == os.path.basename(__file__):
+            # Exec'ing the installer itself would just loop
+            continue
+        
+        log.info(f"Trying: {' '.join(entry_point)}")
         
-        print(f"Trying: {' '.join(entry_point)}")
+        # exec discards whatever other threads are still doing, so let any
+        # remaining installer work finish before replacing the process
+        for thread in threading.enumerate():
+            if thread is not threading.current_thread() and not thread.daemon:
+                thread.join()
         
         try:
-            process = subprocess.Popen(
-                entry_point,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
-            
-            # Stream output in real-time
-            for line in process.stdout:
-                print(line, end='')
-                sys.stdout.flush()
-            
-            process.wait()
-            if process.returncode == 0:
-                return True
-                
-        except Exception as e:
-            print(f"Failed to start: {e}")
+            # The application inherits stdout directly, so write out pending logs first
+            flush_log()
+            os.execvp(entry_point[0], entry_point)
+        except OSError as e:
+            log.warning(f"Failed to start: {e}")
     
     return False
 
 if __name__ == "__main__":
-    print("="*80)
-    print("ULTIMATE INSTALLATION FOR RESTRICTED ENVIRONMENTS")
-    print("="*80)
+    setup_logging()
+    
+    log.info("="*80)
+    log.info("ULTIMATE INSTALLATION FOR RESTRICTED ENVIRONMENTS")
+    log.info("="*80)
     
     # Install Node.js using specialized methods
     node_installed = install_nodejs_restricted()
@@ -476,22 +872,22 @@ if __name__ == "__main__":
     # Install Python dependencies
     python_success = install_python_dependencies_safe()
     
-    # Start the application
-    app_started = start_application()
-    
-    print("\n" + "="*80)
-    print("INSTALLATION SUMMARY")
-    print("="*80)
-    print(f"Node.js installed: {'✓' if node_installed else '✗'}")
-    print(f"Python dependencies: {'✓' if python_success else '✗'}")
-    print(f"Application started: {'✓' if app_started else '✗'}")
-    
-    if not app_started:
-        print("\nTroubleshooting tips:")
-        print("1. Check if your main application file exists")
-        print("2. Check for any error messages above")
-        print("3. Try running manually: python -m SONALI or python main.py")
-        
-        # Show available files
-        print("\nAvailable files:")
-        run_command("ls -la")
\ No newline at end of file
+    # The application replaces this process, so report before starting it
+    log.info("\n" + "="*80)
+    log.info("INSTALLATION SUMMARY")
+    log.info("="*80)
+    log.info(f"Node.js installed: {'✓' if node_installed else '✗'}")
+    log.info(f"Python dependencies: {'✓' if python_success else '✗'}")
+    
+    # Start the application; this only returns if nothing could be started
+    start_application()
+    
+    log.warning("Application started: ✗")
+    log.info("\nTroubleshooting tips:")
+    log.info("1. Check if your main application file exists")
+    log.info("2. Check for any error messages above")
+    log.info("3. Try running manually: python -m SONALI or python main.py")
+    
+    # Show available files
+    log.info("\nAvailable files:")
+    run_command("ls -la")